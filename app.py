@@ -1,271 +1,882 @@
 from flask import Flask, request, jsonify
 import azure.cognitiveservices.speech as speechsdk
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-import tempfile
+import queue
+import random
+import re
+import io
+import json
+import logging
+import logging.handlers
+import atexit
+import functools
 import time
-import uuid
+import secrets
 import subprocess
+import threading
 import shutil
+import struct
+import wave
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# orjson parses the detailed recognition payloads considerably faster when installed
+try:
+    from orjson import loads as _jloads
+except ImportError:
+    from json import loads as _jloads
+
+# PyAV decodes uploads in-process, no ffmpeg spawn per request
+import av
 
 app = Flask(__name__)
 
 from dotenv import load_dotenv
 load_dotenv()
 
+# Upload limits: Werkzeug rejects oversize bodies before reading them
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+MAX_DURATION_SECONDS = int(os.getenv('MAX_DURATION_S', '3600'))
+
+# Level-gated logging: filtered messages are never formatted. start_background_services() moves
+# it onto a queue per process; until then (e.g. in a preloading master) records are written directly,
+# so none are left queued for every forked worker to replay.
+log_listener = None
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger('stt')
+
 # Azure Speech Service credentials
 AZURE_SPEECH_KEY = os.getenv('AZURE_SPEECH_KEY')
 AZURE_REGION = os.getenv('AZURE_REGION', 'centralindia')
+AZURE_KEY_CONFIGURED = bool(AZURE_SPEECH_KEY) and AZURE_SPEECH_KEY != "your_azure_key_here"
+DEFAULT_LANGUAGE = 'en-IN'
+
+# Azure short-audio REST endpoint: one request/response for clips up to 60s
+SHORT_AUDIO_URL = f'https://{AZURE_REGION}.stt.speech.microsoft.com/speech/recognition/conversation/cognitiveservices/v1'
+SHORT_AUDIO_MAX_SECONDS = 55
+# Fast Transcription decodes whole files server-side, far quicker than streaming them in real time
+FAST_TRANSCRIPTION_URL = f'https://{AZURE_REGION}.api.cognitive.microsoft.com/speechtotext/transcriptions:transcribe'
+FAST_TRANSCRIPTION_API_VERSION = '2024-11-15'
+
+# Pooled HTTP session so REST calls reuse warm TLS connections to Azure.
+# Transient Azure error statuses are retried with a short backoff; POST is included since a recognition call
+# is safe to repeat, and the last response is returned (not raised) so a persistent 429 still reaches the caller
+# as a 429. Read timeouts are never retried and Retry-After is ignored: either would multiply how long a
+# request (and its Azure slot) is held, e.g. four full read timeouts for a long Fast Transcription call.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({'GET', 'POST'}),
+        read=False,
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+))
+
+# Long audio is split at silences and its segments recognized in parallel
+SPLIT_THRESHOLD_SECONDS = 300
+MAX_SEGMENT_SECONDS = SHORT_AUDIO_MAX_SECONDS
+SILENCE_END_RE = re.compile(r'silence_end: ([0-9.]+)')
+
+# AZURE_CONCURRENCY is the subscription-wide cap, so each of the WEB_CONCURRENCY server
+# processes (gunicorn_conf.py exports the real count) gets an equal share. Idle pre-connected
+# recognizers hold Azure connections too, so the share covers the pool plus live requests.
+# Every process keeps at least one slot, so with more workers than the cap the total is one per
+# worker and can exceed it; set WEB_CONCURRENCY no higher than AZURE_CONCURRENCY.
+WORKER_COUNT = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+AZURE_CONCURRENCY = int(os.getenv('AZURE_CONCURRENCY', '8'))
+AZURE_WORKER_SHARE = max(1, AZURE_CONCURRENCY // WORKER_COUNT)
+if WORKER_COUNT > AZURE_CONCURRENCY:
+    logger.warning("⚠️ %d workers exceed AZURE_CONCURRENCY=%d, up to %d Azure requests may run at once",
+                   WORKER_COUNT, AZURE_CONCURRENCY, WORKER_COUNT)
+# The pool only speeds up timestamp requests in DEFAULT_LANGUAGE, so it is off unless asked for,
+# and never takes more than half of this process's share
+RECOGNIZER_POOL_SIZE = max(0, int(os.getenv('RECOGNIZER_POOL_SIZE', '0')))
+if RECOGNIZER_POOL_SIZE > AZURE_WORKER_SHARE // 2:
+    logger.warning("⚠️ RECOGNIZER_POOL_SIZE=%d capped at %d, half of this process's %d Azure slots",
+                   RECOGNIZER_POOL_SIZE, AZURE_WORKER_SHARE // 2, AZURE_WORKER_SHARE)
+    RECOGNIZER_POOL_SIZE = AZURE_WORKER_SHARE // 2
+AZURE_SLOTS = AZURE_WORKER_SHARE - RECOGNIZER_POOL_SIZE
+
+# Never run more Azure requests at once than this process's share; requests queue
+# for a slot briefly, then get a 503 instead of a session Azure would cancel
+AZURE_SEMAPHORE = threading.BoundedSemaphore(AZURE_SLOTS)
+AZURE_QUEUE_TIMEOUT = float(os.getenv('AZURE_QUEUE_TIMEOUT', '10'))  # seconds
+RATE_LIMIT_RETRY_AFTER = '2'  # seconds, sent with 429 responses
+BUSY_RETRY_AFTER = '5'  # seconds, sent with 503 responses
+SESSION_POLL_INTERVAL = 0.5  # seconds between a recognition session's checks for an abandoned request
+
+# Worker pool for the blocking Azure calls; jobs are only submitted while holding a slot,
+# so one worker per slot means none ever waits in the executor's queue
+executor = ThreadPoolExecutor(max_workers=AZURE_SLOTS)
+
+# Decoding is CPU-bound: each decode gets FFMPEG_THREADS codec threads, and the cores are shared by
+# every server process, so each gets cpu_count // FFMPEG_THREADS // WORKER_COUNT concurrent decodes.
+# A process always gets at least one, so with more workers than that allows the cap is one per worker.
+FFMPEG_THREADS = 2
+FFMPEG_SEMAPHORE = threading.BoundedSemaphore(max(1, (os.cpu_count() or 1) // FFMPEG_THREADS // WORKER_COUNT))
+
+# Housekeeping (recognizer pool refills) runs off the request path
+cleanup_executor = ThreadPoolExecutor(max_workers=2)
+
+# Resolve ffmpeg (used for silence detection) once at startup and refuse to boot without it
+FFMPEG_BIN = shutil.which('ffmpeg')
+if not FFMPEG_BIN:
+    raise RuntimeError("ffmpeg not found on PATH. Please install ffmpeg.")
+
+
+# Azure-compatible audio is 16kHz, 16-bit, mono
+PCM_BYTES_PER_SECOND = 16000 * 2
+# RIFF fmt tags accepted on the WAV fast path
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioTooLongError(Exception):
+    """Raised when an upload exceeds MAX_DURATION_SECONDS"""
+
+
+class AzureRateLimitedError(Exception):
+    """Raised when Azure rejects a recognition with 'Too many requests'"""
+
+
+class AzureBusyError(Exception):
+    """Raised when no Azure slot frees up within the queueing timeout"""
+
+
+def convert_stream_to_pcm(audio_file, request_id):
+    """Convert an uploaded audio stream to raw 16kHz/16-bit/mono PCM, returns (pcm, duration_seconds)"""
+    # Trust the header over the extension, it is only a few bytes to sniff
+    if is_azure_ready_wav(audio_file.stream):
+        pcm = read_azure_ready_wav(audio_file.stream)
+        duration = len(pcm) / PCM_BYTES_PER_SECOND
+        logger.info("[%s] ⚡ Already 16kHz/16-bit/mono WAV, skipping decode (%.1fs)", request_id, duration)
+        return pcm, duration
+
+    # PyAV seeks in the spooled upload itself, so any container works, MP4 with a trailing index included
+    return decode_to_pcm16k(audio_file.stream, request_id)
+
+
+def decode_to_pcm16k(source, request_id):
+    """Decode a seekable file object in-process with PyAV, returns (pcm, duration_seconds)"""
+    try:
+        logger.info("[%s] 🔄 Decoding audio with PyAV", request_id)
+        max_bytes = (MAX_DURATION_SECONDS + 1) * PCM_BYTES_PER_SECOND
+        pcm = bytearray()
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=16000)
+
+        with FFMPEG_SEMAPHORE, av.open(source) as container:
+            # Reject overlong files from the container header, before decoding anything
+            if container.duration is not None and container.duration / av.time_base > MAX_DURATION_SECONDS:
+                raise AudioTooLongError(container.duration / av.time_base)
+
+            stream = container.streams.audio[0]
+            stream.thread_count = FFMPEG_THREADS
+
+            # Append straight from each frame's plane (the plane is padded, so trim to the samples)
+            for frame in container.decode(stream):
+                for out in resampler.resample(frame):
+                    pcm += memoryview(out.planes[0])[:out.samples * 2]
+                if len(pcm) > max_bytes:
+                    break  # Never decode far past the duration limit
+            for out in resampler.resample(None):  # Flush buffered samples
+                pcm += memoryview(out.planes[0])[:out.samples * 2]
+
+        duration = len(pcm) / PCM_BYTES_PER_SECOND
+        logger.info("[%s] ✅ Decoded to PCM (%.1fs)", request_id, duration)
+        return pcm, duration  # The bytearray itself, a bytes() copy would double peak memory
+
+    except AudioTooLongError:
+        raise
+    except Exception as e:
+        raise Exception(f"Conversion failed: {str(e)}")
 
-# Check if ffmpeg is available
-FFMPEG_PATH = shutil.which('ffmpeg')
+
+def _seek_wav_pcm_data(stream):
+    """Walk the RIFF chunks up to the data of a 16kHz/16-bit/mono PCM WAV, returns the data size or None"""
+    header = stream.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+
+    fmt_ok = False
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+        if chunk_id == b'fmt ':
+            fmt = stream.read(size + (size & 1))
+            if len(fmt) < 16:
+                return None
+            tag, channels, rate, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                # The actual format tag leads the SubFormat GUID
+                tag = struct.unpack('<H', fmt[24:26])[0]
+            fmt_ok = tag == WAVE_FORMAT_PCM and channels == 1 and rate == 16000 and bits == 16
+            if not fmt_ok:
+                return None
+        elif chunk_id == b'data':
+            return size if fmt_ok else None
+        else:
+            # LIST, fact, etc. - chunks are word aligned
+            stream.seek(size + (size & 1), os.SEEK_CUR)
 
 
-def convert_to_wav_ffmpeg(input_path, request_id):
-    """Convert audio to WAV using ffmpeg"""
+def is_azure_ready_wav(stream):
+    """Sniff the header, True if the upload is already 16kHz/16-bit/mono PCM WAV. Leaves the stream where it was."""
+    start = stream.tell()
     try:
-        print(f"[{request_id}] 🔄 Converting audio with ffmpeg")
-        
-        # Create output temp file
-        output_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav', prefix=f'converted_{request_id}_')
-        output_path = output_file.name
-        output_file.close()
-        
-        # FFmpeg command to convert to 16kHz, 16-bit, mono WAV
-        cmd = [
-            'ffmpeg',
-            '-i', input_path,
-            '-ar', '16000',          # Sample rate 16kHz
-            '-ac', '1',              # Mono
-            '-sample_fmt', 's16',    # 16-bit
-            '-y',                    # Overwrite output
-            output_path
-        ]
-        
-        # Run ffmpeg
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=60
-        )
-        
-        if result.returncode != 0:
-            raise Exception(f"FFmpeg conversion failed: {result.stderr.decode()}")
-        
-        print(f"[{request_id}] ✅ Converted to WAV: {output_path}")
-        return output_path
-        
-    except subprocess.TimeoutExpired:
-        raise Exception("Audio conversion timeout (file too large or corrupted)")
-    except FileNotFoundError:
-        raise Exception("FFmpeg not found. Please install ffmpeg.")
-    except Exception as e:
-        raise Exception(f"Conversion failed: {str(e)}")
+        return _seek_wav_pcm_data(stream) is not None
+    finally:
+        stream.seek(start)
+
+
+def read_azure_ready_wav(stream):
+    """Return the PCM frames of a WAV that is_azure_ready_wav accepted"""
+    size = _seek_wav_pcm_data(stream)
+    # Streaming writers leave the data size as 0 or 0xFFFFFFFF, take everything then
+    pcm = stream.read() if size in (0, 0xFFFFFFFF) else stream.read(size)
+    return pcm[:len(pcm) & ~1]
+
+
+def pcm_to_wav(pcm):
+    """Wrap raw 16kHz/16-bit/mono PCM in a WAV header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def wav_header(data_size):
+    """44-byte header for data_size bytes of 16kHz/16-bit/mono PCM"""
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, WAVE_FORMAT_PCM, 1, 16000, PCM_BYTES_PER_SECOND, 2, 16,
+        b'data', data_size
+    )
+
+
+# Raw PCM layout produced by the conversion step, shared by every push stream
+PCM_STREAM_FORMAT = speechsdk.audio.AudioStreamFormat(samples_per_second=16000, bits_per_sample=16, channels=1)
+# Push granularity: larger chunks raise throughput, smaller chunks lower latency
+CHUNK_MS = int(os.getenv('CHUNK_MS', '100'))
+if CHUNK_MS < 1:
+    raise RuntimeError(f"CHUNK_MS must be a positive number of milliseconds, got {CHUNK_MS}")
+PUSH_CHUNK_BYTES = PCM_BYTES_PER_SECOND * CHUNK_MS // 1000  # 3200 bytes at 100ms
+
+
+@functools.lru_cache(maxsize=16)
+def get_speech_config(language, detailed=False):
+    """Build the Azure SpeechConfig for a language once and reuse it across requests"""
+    speech_config = speechsdk.SpeechConfig(
+        subscription=AZURE_SPEECH_KEY,
+        region=AZURE_REGION
+    )
+    speech_config.speech_recognition_language = language
+    # Let the SDK push prerecorded audio at up to 3x real-time instead of the default 2x
+    speech_config.set_property_by_name('SPEECH-AudioThrottleAsPercentageOfRealTime', '300')
+    speech_config.set_property_by_name('SPEECH-TransmitLengthBeforThrottleMs', '5000')
+    speech_config.set_property_by_name('SPEECH-MaxBufferSizeSeconds', '240')
+    if detailed:
+        speech_config.request_word_level_timestamps()
+        speech_config.output_format = speechsdk.OutputFormat.Detailed
+    return speech_config
 
 
-def save_uploaded_file(audio_file, filename, request_id):
-    """Save uploaded audio file temporarily"""
+
+def preload_speech_sdk():
+    """Build and drop one recognizer so the SDK loads its native extensions now, not on the first request"""
     try:
-        print(f"[{request_id}] 💾 Saving audio: {filename}")
-        
-        # Create unique temp file for this request
-        file_ext = os.path.splitext(filename)[1] or '.audio'
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False, 
-            suffix=file_ext, 
-            prefix=f'upload_{request_id}_'
+        push_stream = speechsdk.audio.PushAudioInputStream(stream_format=PCM_STREAM_FORMAT)
+        speechsdk.SpeechRecognizer(
+            speech_config=get_speech_config(DEFAULT_LANGUAGE),
+            audio_config=speechsdk.audio.AudioConfig(stream=push_stream)
         )
-        audio_file.save(temp_file.name)
-        temp_file.close()
-        
-        print(f"[{request_id}] ✅ Audio saved: {temp_file.name}")
-        return temp_file.name
-        
     except Exception as e:
-        print(f"[{request_id}] ❌ Save error: {str(e)}")
-        raise
+        logger.warning("⚠️ Could not preload the Speech SDK: %s", e)
+
+
+# Pre-connected recognizers for the default language, so requests skip the TLS+WebSocket handshake.
+# RECOGNIZER_POOL_SIZE is set with the Azure limits above, since idle connections count against them.
+RECOGNIZER_MAX_AGE = (240, 360)  # seconds, jittered so connections don't all expire together
+RECOGNIZER_POOL_CHECK_INTERVAL = 60
+_recognizer_pools = {}  # (language, detailed) -> queue.Queue of warm recognizers
+
+
+def _build_recognizer(language, detailed, warm=False):
+    """Create a recognizer bound to its own push stream, returns (recognizer, push_stream, connection, expires_at)"""
+    push_stream = speechsdk.audio.PushAudioInputStream(stream_format=PCM_STREAM_FORMAT)
+    recognizer = speechsdk.SpeechRecognizer(
+        speech_config=get_speech_config(language, detailed=detailed),
+        audio_config=speechsdk.audio.AudioConfig(stream=push_stream)
+    )
+    connection = None
+    if warm:
+        connection = speechsdk.Connection.from_recognizer(recognizer)
+        connection.open(True)
+    expires_at = time.monotonic() + random.uniform(*RECOGNIZER_MAX_AGE)
+    return recognizer, push_stream, connection, expires_at
+
+
+def _refill_recognizer_pool(language, detailed):
+    """Top a pool back up with freshly connected recognizers"""
+    pool = _recognizer_pools[(language, detailed)]
+    try:
+        while not pool.full():
+            entry = _build_recognizer(language, detailed, warm=True)
+            try:
+                pool.put_nowait(entry)
+            except queue.Full:
+                entry[2].close()  # Raced with another refill
+                break
+    except Exception as e:
+        logger.warning("⚠️ Could not pre-warm recognizer: %s", e)
 
 
-def safe_delete_file(filename, request_id):
-    """Safely delete a file with retry logic"""
-    if filename and os.path.exists(filename):
-        for attempt in range(3):
-            try:
-                os.unlink(filename)
-                print(f"[{request_id}] 🗑️ Deleted: {os.path.basename(filename)}")
-                return True
-            except PermissionError:
-                if attempt < 2:
-                    time.sleep(0.2)
+def acquire_recognizer(language, detailed):
+    """Take a fresh pre-connected recognizer if one is pooled, else build one, returns (recognizer, push_stream)"""
+    pool = _recognizer_pools.get((language, detailed))
+    if pool is not None:
+        try:
+            while True:
+                try:
+                    recognizer, push_stream, connection, expires_at = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if time.monotonic() < expires_at:
+                    return recognizer, push_stream
+                connection.close()
+        finally:
+            # Only once we have taken ours, so the refill sees the room it left
+            cleanup_executor.submit(_refill_recognizer_pool, language, detailed)
+    recognizer, push_stream, _, _ = _build_recognizer(language, detailed)
+    return recognizer, push_stream
+
+
+def maintain_recognizer_pools():
+    """Rotate expired recognizers out of the pools and refill them, then schedule the next check"""
+    try:
+        now = time.monotonic()
+        for (language, detailed), pool in _recognizer_pools.items():
+            fresh = []
+            while True:
+                try:
+                    entry = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if now < entry[3]:
+                    fresh.append(entry)
                 else:
-                    print(f"[{request_id}] ⚠️ Could not delete: {filename}")
-                    return False
-    return True
+                    entry[2].close()
+            for entry in fresh:
+                pool.put_nowait(entry)
+            _refill_recognizer_pool(language, detailed)
+    finally:
+        timer = threading.Timer(RECOGNIZER_POOL_CHECK_INTERVAL, maintain_recognizer_pools)
+        timer.daemon = True
+        timer.start()
+
+
+# Only timestamped requests stream through a recognizer on the normal path: plain ones go
+# to the short-audio or Fast Transcription REST APIs, so they get no pool of their own
+if AZURE_KEY_CONFIGURED and RECOGNIZER_POOL_SIZE > 0:
+    _recognizer_pools[(DEFAULT_LANGUAGE, True)] = queue.Queue(maxsize=RECOGNIZER_POOL_SIZE)
+
+
+def recognize_short_audio(pcm, language, request_id):
+    """Transcribe short PCM audio with the Azure REST API, returns the text ('' if nothing recognized)"""
+    logger.info("[%s] 🔄 Sending short audio to Azure REST endpoint", request_id)
+    
+    response = HTTP_SESSION.post(
+        SHORT_AUDIO_URL,
+        params={'language': language, 'format': 'simple'},
+        headers={
+            'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY,
+            'Content-Type': 'audio/wav; codecs=audio/pcm; samplerate=16000',
+            'Accept': 'application/json'
+        },
+        data=pcm_to_wav(pcm),
+        timeout=30
+    )
+    
+    if response.status_code == 429:
+        raise AzureRateLimitedError(response.text)
+    if response.status_code != 200:
+        raise Exception(f"Azure REST error {response.status_code}: {response.text}")
+    
+    result = response.json()
+    status = result.get('RecognitionStatus')
+    if status == 'Success':
+        logger.debug("[%s] 📝 Recognized: %s", request_id, result.get('DisplayText', ''))
+        return result.get('DisplayText', '')
+    if status in ('NoMatch', 'InitialSilenceTimeout', 'BabbleTimeout'):
+        logger.warning("[%s] ⚠️ No match (%s)", request_id, status)
+        return ''
+    raise Exception(f"Azure recognition failed: {status}")
+
+
+class MultipartWavBody:
+    """File-like multipart/form-data body that sends PCM as a WAV part without copying it"""
+
+    def __init__(self, definition, pcm):
+        self.boundary = secrets.token_hex(16)
+        head = (
+            f'--{self.boundary}\r\n'
+            'Content-Disposition: form-data; name="definition"\r\n'
+            'Content-Type: application/json\r\n\r\n'
+            f'{definition}\r\n'
+            f'--{self.boundary}\r\n'
+            'Content-Disposition: form-data; name="audio"; filename="audio.wav"\r\n'
+            'Content-Type: audio/wav\r\n\r\n'
+        ).encode() + wav_header(len(pcm))
+        tail = f'\r\n--{self.boundary}--\r\n'.encode()
+        self._parts = [memoryview(head), memoryview(pcm), memoryview(tail)]
+        self._length = sum(len(part) for part in self._parts)
+        self._pos = 0
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        end = self._length if size is None or size < 0 else min(self._pos + size, self._length)
+        chunks = []
+        start = 0
+        for part in self._parts:
+            lo, hi = max(self._pos - start, 0), min(end - start, len(part))
+            if lo < hi:
+                chunks.append(part[lo:hi])
+            start += len(part)
+        self._pos = end
+        return b''.join(chunks)
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        # urllib3 rewinds the body to its starting position before a retry
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._length}[whence]
+        self._pos = min(max(base + pos, 0), self._length)
+        return self._pos
+
+
+def recognize_fast_transcription(pcm, language, request_id):
+    """Transcribe PCM audio with the Azure Fast Transcription API, returns the text ('' if nothing recognized)"""
+    duration = len(pcm) / PCM_BYTES_PER_SECOND
+    logger.info("[%s] 🔄 Sending %.1fs of audio to Azure Fast Transcription", request_id, duration)
+
+    # Streamed from the PCM buffer: a full WAV copy plus a built multipart body would
+    # hold two more copies of up to ~115MB per request
+    body = MultipartWavBody(json.dumps({'locales': [language]}), pcm)
+    response = HTTP_SESSION.post(
+        FAST_TRANSCRIPTION_URL,
+        params={'api-version': FAST_TRANSCRIPTION_API_VERSION},
+        headers={
+            'Ocp-Apim-Subscription-Key': AZURE_SPEECH_KEY,
+            'Content-Type': f'multipart/form-data; boundary={body.boundary}'
+        },
+        data=body,
+        timeout=(10, max(60, duration / 2))
+    )
+
+    if response.status_code == 429:
+        raise AzureRateLimitedError(response.text)
+    if response.status_code != 200:
+        raise Exception(f"Azure Fast Transcription error {response.status_code}: {response.text}")
+
+    phrases = _jloads(response.content).get('combinedPhrases') or []
+    text = phrases[0].get('text', '') if phrases else ''
+    logger.debug("[%s] 📝 Recognized: %s", request_id, text)
+    return text
+
+
+_services_pid = None
+_services_lock = threading.Lock()
+
+
+def start_background_services():
+    """Start this process's log listener, Speech SDK warm-up and recognizer pool upkeep, once per process"""
+    global _services_pid, log_listener
+    with _services_lock:
+        if _services_pid == os.getpid():
+            return
+        _services_pid = os.getpid()
+
+    # Threads don't survive a fork, so every worker process starts its own. From here on request
+    # threads only enqueue records while the listener thread does the stream writes.
+    root = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, *root.handlers)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    log_listener.start()
+    atexit.register(log_listener.stop)  # Flush queued records on shutdown
+
+    # Build the default-language configs and load the SDK's native extensions before the first
+    # request. Done here, in the worker, so a preloading master only shares the imported module.
+    if AZURE_KEY_CONFIGURED:
+        get_speech_config(DEFAULT_LANGUAGE)
+        get_speech_config(DEFAULT_LANGUAGE, detailed=True)
+        preload_speech_sdk()
+    if _recognizer_pools:
+        cleanup_executor.submit(maintain_recognizer_pools)
+
+
+# gunicorn_conf.py defers this to post_fork, so the preloading master never opens
+# Azure connections or starts threads that its forked workers would inherit broken
+if not os.getenv('START_SERVICES_POST_FORK'):
+    start_background_services()
+
+
+def _recognize(pcm, language, duration, request_id, abandoned, *, detailed):
+    """Run continuous recognition on raw PCM, returns (texts, segments, error)"""
+    # Recognizers are single-use: each is bound to its own push stream fed from memory
+    speech_recognizer, push_stream = acquire_recognizer(language, detailed)
+
+    logger.info("[%s] 🔄 Starting continuous recognition", request_id)
+
+    all_results = []
+    all_segments = []
+    done_evt = threading.Event()
+    error_details = None
+    rate_limited = False
+
+    # Looked up once here rather than on every callback
+    recognized_speech = speechsdk.ResultReason.RecognizedSpeech
+    no_match = speechsdk.ResultReason.NoMatch
+
+    def handle_final_result(evt):
+        result = evt.result
+        if result.reason == recognized_speech:
+            all_results.append(result.text)
+            logger.debug("[%s] 📝 Recognized: %s", request_id, result.text)
+            if detailed:
+                nbest = _jloads(result.json).get('NBest')
+                if nbest:
+                    all_segments.append(nbest[0])
+        elif result.reason == no_match:
+            logger.debug("[%s] ⚠️ No match", request_id)
+
+    def handle_canceled(evt):
+        nonlocal error_details, rate_limited
+        logger.info("[%s] ⚠️ Canceled: %s", request_id, evt.reason)
+        if evt.reason == speechsdk.CancellationReason.Error:
+            error_details = evt.error_details
+            rate_limited = (
+                evt.cancellation_details.code == speechsdk.CancellationErrorCode.TooManyRequests
+                or 'Too many requests' in (evt.error_details or '')
+            )
+            logger.error("[%s] ❌ Error: %s", request_id, evt.error_details)
+        done_evt.set()
+
+    def stop_continuous(evt):
+        logger.info("[%s] ✅ Recognition completed", request_id)
+        done_evt.set()
+
+    # Connect callbacks
+    speech_recognizer.recognized.connect(handle_final_result)
+    speech_recognizer.session_stopped.connect(stop_continuous)
+    speech_recognizer.canceled.connect(handle_canceled)
+
+    try:
+        # Start continuous recognition
+        speech_recognizer.start_continuous_recognition()
+
+        # Feed the PCM, then signal end of audio. The SDK only takes bytes, so copy one chunk at a time.
+        view = memoryview(pcm)
+        for offset in range(0, len(view), PUSH_CHUNK_BYTES):
+            push_stream.write(bytes(view[offset:offset + PUSH_CHUNK_BYTES]))
+        push_stream.close()
+
+        # Wait for the session to end, scaled to the audio length. The short polls let a
+        # piece whose request already failed elsewhere stop instead of running to the end.
+        timeout = max(duration + 10, 60)
+        give_up_at = time.monotonic() + timeout
+        while not done_evt.wait(SESSION_POLL_INTERVAL):
+            if abandoned.is_set():
+                logger.info("[%s] ⏹️ Request failed, stopping recognition", request_id)
+                break
+            if time.monotonic() >= give_up_at:
+                logger.warning("[%s] ⚠️ Timeout after %.0fs", request_id, timeout)
+                break
+    finally:
+        # End the Azure session now rather than whenever the recognizer is garbage collected
+        speech_recognizer.stop_continuous_recognition()
+        speechsdk.Connection.from_recognizer(speech_recognizer).close()
+
+    if rate_limited:
+        raise AzureRateLimitedError(error_details)
+    return all_results, all_segments, error_details
+
+
+def acquire_azure_slot(timeout=AZURE_QUEUE_TIMEOUT):
+    """Wait for a free Azure slot, raises AzureBusyError if none frees up in time"""
+    if not AZURE_SEMAPHORE.acquire(timeout=timeout):
+        raise AzureBusyError()
+
+
+def _run_recognition(pcm, language, duration, request_id, abandoned, detailed=False):
+    """Recognize converted PCM audio on an Azure slot the caller took, returns {'texts', 'segments', 'error'}"""
+    try:
+        if abandoned.is_set():
+            return None  # Another piece of the request already failed
+
+        if detailed or duration > SHORT_AUDIO_MAX_SECONDS:
+            # Longer clips, and anything needing word timestamps, use continuous recognition
+            texts, segments, error = _recognize(pcm, language, duration, request_id, abandoned, detailed=detailed)
+            return {'texts': texts, 'segments': segments, 'error': error}
+
+        # Short clips go through a single REST round-trip
+        text = recognize_short_audio(pcm, language, request_id)
+        return {'texts': [text] if text else [], 'segments': [], 'error': None}
+    finally:
+        AZURE_SEMAPHORE.release()
+
+
+def find_silence_ends(pcm, request_id):
+    """Run ffmpeg silencedetect over raw PCM, returns the silence_end timestamps in seconds"""
+    cmd = [
+        FFMPEG_BIN,
+        '-nostdin',
+        '-hide_banner',
+        '-nostats',
+        '-f', 's16le', '-ar', '16000', '-ac', '1',
+        '-i', 'pipe:0',
+        '-af', 'silencedetect=n=-35dB:d=0.5',
+        '-f', 'null', '-'
+    ]
+    try:
+        with FFMPEG_SEMAPHORE:
+            proc = subprocess.run(cmd, input=pcm, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=60)
+    except subprocess.TimeoutExpired:
+        logger.warning("[%s] ⚠️ Silence detection timed out, splitting at fixed intervals", request_id)
+        return []
+    return [float(t) for t in SILENCE_END_RE.findall(proc.stderr.decode(errors='replace'))]
+
+
+def split_pcm_on_silence(pcm, silence_ends):
+    """Cut PCM into pieces of at most MAX_SEGMENT_SECONDS at silences, returns [(start_seconds, pcm_view)]"""
+    total = len(pcm) / PCM_BYTES_PER_SECOND
+    bounds = []
+    start = 0.0
+    while total - start > MAX_SEGMENT_SECONDS:
+        limit = start + MAX_SEGMENT_SECONDS
+        candidates = [t for t in silence_ends if start < t <= limit]
+        cut = candidates[-1] if candidates else limit
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+
+    def offset(seconds):
+        return int(seconds * 16000) * 2  # Whole 16-bit samples only
+
+    # Views into the one buffer, so a long upload is never held in memory twice
+    view = memoryview(pcm)
+    return [(a, view[offset(a):offset(b)]) for a, b in bounds]
+
+
+def transcribe_pcm(pcm, language, duration, request_id, detailed=False):
+    """Recognize PCM on the worker pool, fanning long audio out over silence-split segments"""
+    if not detailed and duration > SHORT_AUDIO_MAX_SECONDS:
+        # One Fast Transcription call beats streaming; fall back to streaming if it fails
+        acquire_azure_slot()
+        try:
+            text = recognize_fast_transcription(pcm, language, request_id)
+            return {'texts': [text] if text else [], 'segments': [], 'error': None}
+        except AzureRateLimitedError:
+            raise
+        except Exception as e:
+            logger.warning("[%s] ⚠️ Fast Transcription failed, falling back to streaming: %s", request_id, e)
+        finally:
+            AZURE_SEMAPHORE.release()
+
+    if duration > SPLIT_THRESHOLD_SECONDS:
+        pieces = split_pcm_on_silence(pcm, find_silence_ends(pcm, request_id))
+        logger.info("[%s] ✂️ Split %.0fs of audio into %d segments", request_id, duration, len(pieces))
+    else:
+        pieces = [(0.0, pcm)]
+
+    # Each Azure slot is taken here, before the piece is handed to a worker, so the queueing
+    # timeout runs from the request's arrival and nothing waits in the executor. The first piece
+    # waits AZURE_QUEUE_TIMEOUT (then 503); the rest of a split file wait their turn up to the deadline.
+    deadline = time.monotonic() + max(duration + 30, 90)
+    abandoned = threading.Event()  # Set once the request fails, so its running pieces stop
+    futures = []
+    merged = {'texts': [], 'segments': [], 'error': None}
+    try:
+        for index, (_, piece) in enumerate(pieces):
+            if any(f.done() and f.exception() is not None for f in futures):
+                break  # An earlier piece failed, collecting below raises its error
+            if index == 0:
+                acquire_azure_slot()
+            elif not AZURE_SEMAPHORE.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise FutureTimeoutError()
+            try:
+                futures.append(executor.submit(
+                    _run_recognition, piece, language, len(piece) / PCM_BYTES_PER_SECOND, request_id, abandoned, detailed
+                ))
+            except Exception:
+                AZURE_SEMAPHORE.release()
+                raise
+
+        for (start, _), future in zip(pieces, futures):
+            result = future.result(timeout=max(deadline - time.monotonic(), 0))
+            merged['texts'].extend(result['texts'])
+            merged['error'] = merged['error'] or result['error']
+            # Word offsets (100ns ticks) are relative to the segment, make them absolute
+            ticks = int(start * 10_000_000)
+            for segment in result['segments']:
+                for word in segment.get('Words', []):
+                    word['Offset'] = word.get('Offset', 0) + ticks
+                merged['segments'].append(segment)
+    except Exception:
+        # Running pieces see the flag and stop their sessions; queued ones never run
+        abandoned.set()
+        for future in futures:
+            if future.cancel():
+                AZURE_SEMAPHORE.release()  # Never ran, so its slot is still held here
+        raise
+    return merged
+
+
+def rate_limited_response(request_id, details):
+    """JSON 429 telling the client to back off when Azure reports too many requests"""
+    logger.warning("[%s] ⚠️ Azure rate limited: %s", request_id, details)
+    return jsonify({
+        'success': False,
+        'error': 'Speech service is busy, please retry shortly',
+        'request_id': request_id
+    }), 429, {'Retry-After': RATE_LIMIT_RETRY_AFTER}
+
+
+def azure_busy_response(request_id):
+    """JSON 503 when every Azure slot stayed taken for the whole queueing timeout"""
+    logger.warning("[%s] ⚠️ No Azure slot free after %.0fs", request_id, AZURE_QUEUE_TIMEOUT)
+    return jsonify({
+        'success': False,
+        'error': 'Server is at capacity, please retry shortly',
+        'request_id': request_id
+    }), 503, {'Retry-After': BUSY_RETRY_AFTER}
+
+
+def audio_too_long_response(request_id):
+    """JSON 413 for audio over MAX_DURATION_SECONDS"""
+    return jsonify({
+        'success': False,
+        'error': 'Audio too long',
+        'message': f'Maximum supported duration is {MAX_DURATION_SECONDS}s',
+        'request_id': request_id
+    }), 413
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """JSON 413 for bodies over MAX_CONTENT_LENGTH, rejected before they are buffered"""
+    return jsonify({
+        'success': False,
+        'error': 'Upload too large',
+        'message': f"Maximum upload size is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)}MB"
+    }), 413
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    ffmpeg_status = "available" if FFMPEG_PATH else "not found"
     return jsonify({
         'status': 'healthy',
         'service': 'Azure Speech-to-Text API',
         'version': '1.0',
         'provider': 'Azure Cognitive Services',
-        'default_language': 'en-IN',
-        'ffmpeg': ffmpeg_status,
+        'default_language': DEFAULT_LANGUAGE,
+        'ffmpeg': FFMPEG_BIN,
         'concurrent_support': True
     }), 200
 
 
-@app.route('/transcribe', methods=['POST'])
-def transcribe_audio():
-    """Speech-to-Text endpoint - handles all audio durations"""
-    request_id = str(uuid.uuid4())[:8]
-    temp_input = None
-    temp_wav = None
+def _do_transcribe(audio_file, language, detailed):
+    """Shared body of the transcription routes, word-level segments when detailed"""
+    request_id = secrets.token_hex(4)
     
     try:
-        if not AZURE_SPEECH_KEY or AZURE_SPEECH_KEY == "your_azure_key_here":
+        if not AZURE_KEY_CONFIGURED:
             return jsonify({'error': 'Azure Speech API key not configured'}), 500
 
-        if not FFMPEG_PATH:
-            return jsonify({'error': 'FFmpeg not installed on server'}), 500
-
-        if 'audio' not in request.files:
+        if audio_file is None:
             return jsonify({'error': 'No audio file provided'}), 400
 
-        audio_file = request.files['audio']
         if audio_file.filename == '':
             return jsonify({'error': 'Empty filename'}), 400
 
-        language = request.form.get('language', 'en-IN')
+        logger.info("[%s] 📝 Transcription request: file=%s language=%s detailed=%s",
+                    request_id, audio_file.filename, language, detailed)
 
-        print(f"\n[{request_id}] {'='*50}")
-        print(f"[{request_id}] 📝 Transcription Request:")
-        print(f"[{request_id}]    File: {audio_file.filename}")
-        print(f"[{request_id}]    Language: {language}")
-        print(f"[{request_id}] {'='*50}\n")
-
-        # Step 1: Save uploaded file
+        # Step 1: Decode the upload into Azure-compatible PCM in memory
         try:
-            temp_input = save_uploaded_file(audio_file, audio_file.filename, request_id)
+            pcm, duration = convert_stream_to_pcm(audio_file, request_id)
+        except AudioTooLongError:
+            return audio_too_long_response(request_id)
         except Exception as e:
             return jsonify({
                 'success': False,
-                'error': f'Failed to save file: {str(e)}',
+                'error': f'Audio conversion failed: {str(e)}',
+                'message': 'Please upload a valid audio file',
                 'request_id': request_id
             }), 400
 
-        # Step 2: Convert to Azure-compatible WAV
+        if duration > MAX_DURATION_SECONDS:
+            return audio_too_long_response(request_id)
+
+        # Step 2: Recognize on the worker pool
         try:
-            temp_wav = convert_to_wav_ffmpeg(temp_input, request_id)
-            # Clean up input file after conversion
-            safe_delete_file(temp_input, request_id)
-            temp_input = None
-        except Exception as e:
-            safe_delete_file(temp_input, request_id)
+            result = transcribe_pcm(pcm, language, duration, request_id, detailed=detailed)
+        except AzureRateLimitedError as e:
+            return rate_limited_response(request_id, e)
+        except AzureBusyError:
+            return azure_busy_response(request_id)
+        except FutureTimeoutError:
+            logger.warning("[%s] ⚠️ Recognition did not finish in time", request_id)
             return jsonify({
                 'success': False,
-                'error': f'Audio conversion failed: {str(e)}',
-                'message': 'Please upload a valid audio file',
+                'error': 'Recognition timed out',
                 'request_id': request_id
-            }), 400
-
-        # Step 3: Configure Azure Speech Service
-        speech_config = speechsdk.SpeechConfig(
-            subscription=AZURE_SPEECH_KEY,
-            region=AZURE_REGION
-        )
-        speech_config.speech_recognition_language = language
-
-        # Create audio configuration
-        audio_config = speechsdk.AudioConfig(filename=temp_wav)
-
-        print(f"[{request_id}] 🔄 Starting continuous recognition")
-        
-        # Create speech recognizer
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config
-        )
+            }), 504
+        all_results = result['texts']
 
-        all_results = []
-        done = False
-        error_occurred = False
-        error_details = None
-
-        def handle_recognizing(evt):
-            print(f"[{request_id}] 🔄 Recognizing: {evt.result.text}")
-
-        def handle_final_result(evt):
-            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                all_results.append(evt.result.text)
-                print(f"[{request_id}] 📝 Recognized: {evt.result.text}")
-            elif evt.result.reason == speechsdk.ResultReason.NoMatch:
-                print(f"[{request_id}] ⚠️ No match")
-
-        def handle_canceled(evt):
-            nonlocal done, error_occurred, error_details
-            print(f"[{request_id}] ⚠️ Canceled: {evt.reason}")
-            if evt.reason == speechsdk.CancellationReason.Error:
-                error_occurred = True
-                error_details = evt.error_details
-                print(f"[{request_id}] ❌ Error: {evt.error_details}")
-            done = True
-
-        def stop_continuous(evt):
-            nonlocal done
-            done = True
-            print(f"[{request_id}] ✅ Recognition completed")
-
-        # Connect callbacks
-        speech_recognizer.recognizing.connect(handle_recognizing)
-        speech_recognizer.recognized.connect(handle_final_result)
-        speech_recognizer.session_stopped.connect(stop_continuous)
-        speech_recognizer.canceled.connect(handle_canceled)
-
-        # Start continuous recognition
-        speech_recognizer.start_continuous_recognition()
-
-        # Wait with timeout
-        timeout = 180  # 3 minutes
-        start_time = time.time()
-        
-        while not done:
-            time.sleep(0.1)
-            if time.time() - start_time > timeout:
-                print(f"[{request_id}] ⚠️ Timeout after {timeout}s")
-                break
-
-        # Stop recognition
-        speech_recognizer.stop_continuous_recognition()
-        
-        # Clean up
-        speech_recognizer = None
-        audio_config = None
-        time.sleep(0.3)  # Give time for file handles to release
-        safe_delete_file(temp_wav, request_id)
-        
         # Check for errors
-        if error_occurred:
+        if result['error']:
             return jsonify({
                 'success': False,
-                'error': f'Recognition error: {error_details}',
+                'error': f'Recognition error: {result["error"]}',
                 'request_id': request_id
             }), 500
 
         if all_results:
             full_text = " ".join(all_results)
-            print(f"[{request_id}] ✅ Transcription: {full_text}\n")
+            logger.debug("[%s] ✅ Transcription: %s", request_id, full_text)
             
-            return jsonify({
+            response = {
                 'success': True,
                 'text': full_text,
                 'language': language,
-                'provider': 'Azure Speech Services',
                 'request_id': request_id
-            }), 200
+            }
+            if detailed:
+                response['segments'] = result['segments']
+            else:
+                response['provider'] = 'Azure Speech Services'
+            return jsonify(response), 200
         else:
             return jsonify({
                 'success': False,
@@ -275,13 +886,7 @@ def transcribe_audio():
             }), 400
 
     except Exception as e:
-        # Clean up any remaining temp files
-        safe_delete_file(temp_input, request_id)
-        safe_delete_file(temp_wav, request_id)
-        
-        print(f"[{request_id}] ❌ Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[%s] ❌ Error: %s", request_id, e)
         
         return jsonify({
             'success': False,
@@ -291,113 +896,26 @@ def transcribe_audio():
         }), 500
 
 
+@app.route('/transcribe', methods=['POST'])
+def transcribe_audio():
+    """Speech-to-Text endpoint - handles all audio durations"""
+    return _do_transcribe(request.files.get('audio'), request.form.get('language', DEFAULT_LANGUAGE), detailed=False)
+
+
 @app.route('/transcribe-with-timestamps', methods=['POST'])
 def transcribe_with_timestamps():
     """Speech-to-Text with timestamps"""
-    request_id = str(uuid.uuid4())[:8]
-    temp_input = None
-    temp_wav = None
-    
-    try:
-        if not AZURE_SPEECH_KEY or AZURE_SPEECH_KEY == "your_azure_key_here":
-            return jsonify({'error': 'Azure API key not configured'}), 500
-
-        if not FFMPEG_PATH:
-            return jsonify({'error': 'FFmpeg not installed'}), 500
-
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No audio file'}), 400
-
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
-            return jsonify({'error': 'Empty filename'}), 400
-
-        language = request.form.get('language', 'en-IN')
-
-        # Save and convert
-        temp_input = save_uploaded_file(audio_file, audio_file.filename, request_id)
-        temp_wav = convert_to_wav_ffmpeg(temp_input, request_id)
-        safe_delete_file(temp_input, request_id)
-
-        # Configure Azure
-        speech_config = speechsdk.SpeechConfig(
-            subscription=AZURE_SPEECH_KEY,
-            region=AZURE_REGION
-        )
-        speech_config.speech_recognition_language = language
-        speech_config.request_word_level_timestamps()
-        speech_config.output_format = speechsdk.OutputFormat.Detailed
-
-        audio_config = speechsdk.AudioConfig(filename=temp_wav)
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config
-        )
-
-        all_results = []
-        all_segments = []
-        done = False
-
-        def handle_result(evt):
-            if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-                import json
-                detailed = json.loads(evt.result.json)
-                all_results.append(evt.result.text)
-                if 'NBest' in detailed and detailed['NBest']:
-                    all_segments.append(detailed['NBest'][0])
-
-        def stop_cb(evt):
-            nonlocal done
-            done = True
-
-        speech_recognizer.recognized.connect(handle_result)
-        speech_recognizer.session_stopped.connect(stop_cb)
-        speech_recognizer.canceled.connect(stop_cb)
-
-        speech_recognizer.start_continuous_recognition()
-
-        timeout = 180
-        start = time.time()
-        while not done and (time.time() - start < timeout):
-            time.sleep(0.1)
-
-        speech_recognizer.stop_continuous_recognition()
-        speech_recognizer = None
-        audio_config = None
-        time.sleep(0.3)
-        safe_delete_file(temp_wav, request_id)
-
-        if all_results:
-            return jsonify({
-                'success': True,
-                'text': " ".join(all_results),
-                'language': language,
-                'segments': all_segments,
-                'request_id': request_id
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'No speech recognized',
-                'request_id': request_id
-            }), 400
-
-    except Exception as e:
-        safe_delete_file(temp_input, request_id)
-        safe_delete_file(temp_wav, request_id)
-        print(f"[{request_id}] Error: {str(e)}")
-        return jsonify({'success': False, 'error': str(e), 'request_id': request_id}), 500
+    return _do_transcribe(request.files.get('audio'), request.form.get('language', DEFAULT_LANGUAGE), detailed=True)
 
 
 @app.route('/')
 def home():
-    ffmpeg_status = "✅ Installed" if FFMPEG_PATH else "❌ Not Found"
     return jsonify({
         'message': 'Azure Speech-to-Text API',
         'status': 'running',
         'provider': 'Azure Cognitive Services',
         'default_language': 'en-IN (Indian English)',
-        'ffmpeg': ffmpeg_status,
+        'ffmpeg': "✅ Installed",
         'supported_formats': ['WAV', 'MP3', 'OGG', 'M4A', 'FLAC', 'AAC', 'OPUS', 'WebM'],
         'features': [
             'Handles audio of ANY duration',
@@ -405,6 +923,10 @@ def home():
             'Continuous recognition',
             'Concurrent requests supported'
         ],
+        'streaming': {
+            'chunk_ms': CHUNK_MS,
+            'tradeoff': 'Larger CHUNK_MS raises throughput, smaller CHUNK_MS lowers latency'
+        },
         'endpoints': {
             'health': '/health',
             'transcribe': '/transcribe',
@@ -413,21 +935,18 @@ def home():
     })
 
 
-if __name__ == '__main__':
+if __name__ == '__main__' and os.getenv('DEV'):
     port = int(os.environ.get('PORT', 5001))
     print("\n" + "="*60)
     print("🎤 AZURE SPEECH-TO-TEXT API SERVER")
     print("="*60)
-    if not AZURE_SPEECH_KEY or AZURE_SPEECH_KEY == "your_azure_key_here":
+    if not AZURE_KEY_CONFIGURED:
         print("⚠️ WARNING: Azure Speech API key not configured")
     else:
         print("✅ Azure Speech Key: Configured")
         print(f"✅ Azure Region: {AZURE_REGION}")
     
-    if FFMPEG_PATH:
-        print(f"✅ FFmpeg: {FFMPEG_PATH}")
-    else:
-        print("❌ FFmpeg: NOT FOUND - Please install ffmpeg!")
+    print(f"✅ FFmpeg: {FFMPEG_BIN}")
     
     print(f"✅ Default Language: en-IN (Indian English)")
     print(f"\n🌐 Server: http://0.0.0.0:{port}")
@@ -435,5 +954,6 @@ if __name__ == '__main__':
     print("⏱️  Handles ANY duration audio")
     print("="*60 + "\n")
     
-    app.run(debug=True, port=port, host='0.0.0.0', threaded=True)
+    # Development server only; production runs under gunicorn (see gunicorn_conf.py)
+    app.run(debug=False, port=port, host='0.0.0.0', threaded=True)
 
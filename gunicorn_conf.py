@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# gthread workers: the Azure SDK and ffmpeg release the GIL, so threads overlap well
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+os.environ['WEB_CONCURRENCY'] = str(workers)  # app.py splits Azure and decoder limits across workers
+threads = 4
+timeout = 240
+
+# Import the app (Azure SDK module, ffmpeg lookup) once in the master and share it with workers
+preload_app = True
+
+# Background threads and Azure connections must belong to the worker, not the preloading master
+os.environ['START_SERVICES_POST_FORK'] = '1'
+
+
+def post_fork(server, worker):
+    """Start the per-process background services in each freshly forked worker"""
+    from app import start_background_services
+    start_background_services()